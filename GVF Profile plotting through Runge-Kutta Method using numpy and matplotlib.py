@@ -1,25 +1,72 @@
+import math
 import numpy as np
-import matplotlib.pyplot as plt
-import sys
+from functools import cached_property, lru_cache
+from typing import NamedTuple
+
+try:
+    from numba import njit, prange, get_num_threads
+    HAVE_NUMBA = True
+except ImportError:
+    # numba is optional: fall back to plain Python with identical results
+    HAVE_NUMBA = False
+    prange = range
+    def get_num_threads():
+        return 1
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# Cube root, used for R^(2/3) = cbrt(R*R) and R^(4/3) = R*cbrt(R) instead
+# of a generic pow. math.cbrt needs Python 3.11+; numba lowers np.cbrt on
+# scalars to libm's cbrt.
+_cbrt_py = getattr(math, "cbrt", lambda v: v ** (1.0/3.0))
+
+if HAVE_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _cbrt(v):
+        return np.cbrt(v)
+else:
+    _cbrt = _cbrt_py
 
 # ==========================================
 # 1. GEOMETRY & HYDRAULIC CLASSES
 # ==========================================
 
-class Channel:
-    def __init__(self, Q, n, S0, b, m):
-        self.Q = Q      # Discharge (m^3/s)
-        self.n = n      # Manning's roughness
-        self.S0 = S0    # Bed slope
-        self.b = b      # Bottom width (m)
-        self.m = m      # Side slope (H:V)
-        self.g = 9.81   # Gravity
+class _ChannelFields(NamedTuple):
+    Q: float            # Discharge (m^3/s)
+    n: float            # Manning's roughness
+    S0: float           # Bed slope
+    b: float            # Bottom width (m)
+    m: float            # Side slope (H:V)
+    g: float = 9.81     # Gravity
+
+class Channel(_ChannelFields):
+    # Loop-invariant constants, computed on first access and then stored
+    # on the instance (a NamedTuple cannot override __new__, hence the
+    # subclass). Solvers pass them into their inner loops as plain
+    # arguments. np.sqrt keeps them valid for array-valued fields.
+    @cached_property
+    def _sqrt_1pm2(self):
+        return np.sqrt(1.0 + self.m * self.m)
+
+    @cached_property
+    def _sqrt_S0(self):
+        return np.sqrt(self.S0)
+
+    @cached_property
+    def _n2Q2(self):
+        return self.n * self.n * self.Q * self.Q
+
+    @cached_property
+    def _Q2_g(self):
+        return self.Q * self.Q / self.g
 
     def area(self, y):
         return (self.b + self.m * y) * y
 
     def perimeter(self, y):
-        return self.b + 2 * y * np.sqrt(1 + self.m**2)
+        return self.b + 2 * y * self._sqrt_1pm2
 
     def top_width(self, y):
         return self.b + 2 * self.m * y
@@ -33,143 +80,632 @@ class Channel:
 # 2. SOLVING NORMAL & CRITICAL DEPTH
 # ==========================================
 
-def solve_normal_depth(ch):
+def solve_normal_depth_array(Q, n, S0, b, m):
     """
-    Solves Manning's Equation for yn using Newton-Raphson.
+    Solves Manning's Equation for yn using Newton-Raphson, elementwise
+    over arrays of channel parameters (inputs are broadcast together).
     Target: Q - (1/n)*A*R^(2/3)*S0^(1/2) = 0
+    Returns (y, ok) where ok marks the entries that converged.
     """
-    y = 4.0  # Initial guess
+    Q, n, S0, b, m = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (Q, n, S0, b, m)])
+    y = np.full_like(Q, 4.0)  # Initial guess
     tol = 1e-6
     max_iter = 100
 
-    for _ in range(max_iter):
-        A = ch.area(y)
-        P = ch.perimeter(y)
-        R = A / P
-        T = ch.top_width(y)
-        
-        # Function value (Manning Discrepancy)
-        Q_calc = (1.0 / ch.n) * A * (R**(2/3)) * (ch.S0**0.5)
-        f = Q_calc - ch.Q
-        
-        # Derivative (finite difference approximation for simplicity)
-        dy_small = 1e-5
-        A_d = ch.area(y+dy_small)
-        P_d = ch.perimeter(y+dy_small)
-        R_d = A_d / P_d
-        Q_calc_d = (1.0 / ch.n) * A_d * (R_d**(2/3)) * (ch.S0**0.5)
-        df = (Q_calc_d - Q_calc) / dy_small
-        
-        if abs(f) < tol:
-            return y
-        
-        y = y - f / df
-        if y <= 0: y = 0.1 # Prevent negative depth during iteration
-        
-    print("Warning: Normal depth did not converge.")
-    return y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Loop-invariant constants (S0 <= 0 has no normal depth and
+        # surfaces as a NaN entry with ok=False)
+        dP = 2 * np.sqrt(1 + m**2)
+        invn_sqrtS0 = np.sqrt(S0) / n
 
-def solve_critical_depth(ch):
+        for _ in range(max_iter):
+            A = (b + m * y) * y
+            P = b + y * dP
+            R = A / P
+
+            # Function value (Manning Discrepancy)
+            R13 = np.cbrt(R)
+            Q_calc = invn_sqrtS0 * A * R13 * R13
+            f = Q_calc - Q
+
+            # Only channels that have not converged keep iterating
+            # (written so that NaN residuals count as not converged)
+            active = ~(np.abs(f) < tol)
+            if not active.any():
+                break
+
+            # Analytic derivative dQ_calc/dy
+            dA = b + 2 * m * y
+            dR = (dA * P - A * dP) / P**2
+            df = invn_sqrtS0 * (dA * R13 * R13 + A * (2/3) * dR / R13)
+
+            y = np.where(active, y - f / df, y)
+            y = np.where(y <= 0, 0.1, y) # Prevent negative depth during iteration
+
+    return y, np.isfinite(y) & (np.abs(f) < tol)
+
+def solve_critical_depth_array(Q, b, m, g=9.81):
     """
-    Solves Froude=1 for yc using Newton-Raphson.
+    Solves Froude=1 for yc using Newton-Raphson, elementwise over arrays
+    of channel parameters (inputs are broadcast together).
     Target: (Q^2 * T) / (g * A^3) - 1 = 0
+    Returns (y, ok) where ok marks the entries that converged.
     """
-    y = 2.0 # Initial guess
+    Q, b, m, g = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (Q, b, m, g)])
+    y = np.full_like(Q, 2.0) # Initial guess
     tol = 1e-6
     max_iter = 100
-    
-    for _ in range(max_iter):
-        A = ch.area(y)
-        T = ch.top_width(y)
-        
-        if A <= 0: A = 0.1
-        
-        # Froude Number Squared
-        Fr2 = (ch.Q**2 * T) / (ch.g * A**3)
-        f = Fr2 - 1.0
-        
-        # Derivative (finite difference)
-        dy_small = 1e-5
-        A_d = ch.area(y+dy_small)
-        T_d = ch.top_width(y+dy_small)
-        Fr2_d = (ch.Q**2 * T_d) / (ch.g * A_d**3)
-        df = (Fr2_d - Fr2) / dy_small
-        
-        if abs(f) < tol:
-            return y
-            
-        y = y - f / df
-        if y <= 0: y = 0.1
 
-    print("Warning: Critical depth did not converge.")
-    return y
+    # Loop-invariant constants
+    Q2_g = Q**2 / g
+    dT = 2 * m
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(max_iter):
+            A = (b + m * y) * y
+            T = b + 2 * m * y
+
+            A = np.where(A <= 0, 0.1, A)
+
+            # Froude Number Squared
+            Fr2 = Q2_g * T / A**3
+            f = Fr2 - 1.0
+
+            active = ~(np.abs(f) < tol)
+            if not active.any():
+                break
+
+            # Analytic derivative dFr2/dy = Q^2/g * (dT*A^3 - T*3A^2*dA) / A^6
+            dA = b + 2 * m * y
+            df = Q2_g * (dT * A - 3 * T * dA) / A**4
+
+            y = np.where(active, y - f / df, y)
+            y = np.where(y <= 0, 0.1, y)
+
+    return y, np.isfinite(y) & (np.abs(f) < tol)
+
+def _manning_residual(y, Q, b, m, sqrt_1pm2, invn_sqrtS0):
+    A = (b + m * y) * y
+    R = A / (b + 2 * y * sqrt_1pm2)
+    return invn_sqrtS0 * A * _cbrt_py(R * R) - Q
+
+def _critical_residual(y, Q2_g, b, m):
+    A = (b + m * y) * y
+    return Q2_g * (b + 2 * m * y) / A**3 - 1.0
+
+def _bracket(f, args, lo=1e-4, hi=50.0):
+    """
+    Widens [lo, hi] until f changes sign. Both residuals are monotonic
+    in y, so doubling the upper bound finds any root that exists.
+    Returns None when there is no sign change (no root).
+    """
+    f_lo = f(lo, *args)
+    for _ in range(20):
+        if f_lo * f(hi, *args) <= 0:
+            return lo, hi
+        hi *= 2
+    return None
+
+def solve_normal_depth(ch):
+    """
+    Solves Manning's Equation for yn using Brent's method.
+    Target: Q - (1/n)*A*R^(2/3)*S0^(1/2) = 0
+    Returns (yn, converged); yn is NaN when there is no normal depth.
+    """
+    if ch.S0 <= 0: return math.nan, False # Horizontal/adverse bed: no uniform flow
+
+    args = (ch.Q, ch.b, ch.m, ch._sqrt_1pm2, ch._sqrt_S0 / ch.n)
+    bracket = _bracket(_manning_residual, args)
+    if bracket is None:
+        return math.nan, False
+    lo, hi = bracket
+    # Imported here: scipy.optimize adds ~0.3 s to module import
+    from scipy.optimize import brentq
+    y, r = brentq(_manning_residual, lo, hi, args=args, xtol=1e-6, full_output=True, disp=False)
+    return y, r.converged
+
+def solve_critical_depth(ch):
+    """
+    Solves Froude=1 for yc using Brent's method.
+    Target: (Q^2 * T) / (g * A^3) - 1 = 0
+    Returns (yc, converged); yc is NaN when no root was found.
+    """
+    args = (ch._Q2_g, ch.b, ch.m)
+    bracket = _bracket(_critical_residual, args)
+    if bracket is None:
+        return math.nan, False
+    lo, hi = bracket
+    from scipy.optimize import brentq
+    y, r = brentq(_critical_residual, lo, hi, args=args, xtol=1e-6, full_output=True, disp=False)
+    return y, r.converged
 
 # ==========================================
 # 3. RUNGE-KUTTA (RK4) IMPLEMENTATION
 # ==========================================
 
-def get_dy_dx(x, y, ch):
+# Compiled geometry kernels. Channel parameters are passed as plain floats
+# so numba can keep the whole RK4 step in machine code.
+
+@njit(cache=True, fastmath=True)
+def _area(y, b, m):
+    return (b + m * y) * y
+
+@njit(cache=True, fastmath=True)
+def _perimeter(y, b, sqrt_1pm2):
+    return b + 2 * y * sqrt_1pm2
+
+@njit(cache=True, fastmath=True)
+def _top_width(y, b, m):
+    return b + 2 * m * y
+
+@njit(cache=True, fastmath=True)
+def _get_dy_dx(y, n2Q2, Q2_g, S0, b, m, sqrt_1pm2):
     """
-    The Differential Equation: dy/dx = (S0 - Sf) / (1 - Fr^2)
+    Returns (dy/dx, stop). stop is True near critical depth, where the
+    slope is reported as 0. Below the dry-bed cap the slope is also 0 but
+    stop stays False: an RK stage can dip there without the profile
+    drying out, so callers test the cap on the accepted depth instead.
     """
-    if y <= 0.05: return 0 # Min depth cap
+    if y <= 0.05: return 0.0, False # Min depth cap
 
-    A = ch.area(y)
-    P = ch.perimeter(y)
+    A = _area(y, b, m)
+    invA = 1.0 / A
+    P = _perimeter(y, b, sqrt_1pm2)
     R = A / P
-    T = ch.top_width(y)
+    T = _top_width(y, b, m)
 
     # 1. Friction Slope (Sf)
     # Sf = (n^2 * Q^2) / (A^2 * R^(4/3))
-    Sf = (ch.n**2 * ch.Q**2) / (A**2 * np.power(R, 4.0/3.0))
+    Sf = n2Q2 * invA * invA / (R * _cbrt(R))
 
     # 2. Froude Number (Fr)
-    Fr2 = (ch.Q**2 * T) / (ch.g * A**3)
+    # Fr2 = (Q^2 * T) / (g * A^3)
+    Fr2 = Q2_g * T * invA * invA * invA
 
     # 3. Singularity Check
     if abs(1 - Fr2) < 0.01:
         # We are hitting critical depth (denominator -> 0).
         # We stop the slope calculation to prevent infinity.
-        return 0 
+        return 0.0, True
 
-    dydx = (ch.S0 - Sf) / (1 - Fr2)
-    return dydx
+    return (S0 - Sf) / (1 - Fr2), False
 
-def solve_profile(ch, x_start, y_start, length, step_size):
-    x_vals = [x_start]
-    y_vals = [y_start]
-    
-    current_x = x_start
-    current_y = y_start
-    
+def get_dy_dx(x, y, ch):
+    """
+    The Differential Equation: dy/dx = (S0 - Sf) / (1 - Fr^2)
+    """
+    return _get_dy_dx(y, ch._n2Q2, ch._Q2_g, ch.S0, ch.b, ch.m, ch._sqrt_1pm2)[0]
+
+def _rk4_loop(dydx, params, x0, y0, dx, N):
+    """
+    Fixed-step RK4 loop for (dy/dx, stop) = dydx(y, *params). Returns the computed
+    stations; fewer than N+1 points means the profile stopped early
+    (critical depth or dry bed).
+    """
+    x_vals = np.empty(N + 1)
+    y_vals = np.empty(N + 1)
+    x_vals[0] = x0
+    y_vals[0] = y0
+
+    current_x = x0
+    current_y = y0
+    k = 1
+
+    for _ in range(N):
+        # RK4 Constants
+        k1, stop1 = dydx(current_y, *params)
+        k2, stop2 = dydx(current_y + k1*dx/2, *params)
+        k3, stop3 = dydx(current_y + k2*dx/2, *params)
+        k4, stop4 = dydx(current_y + k3*dx, *params)
+
+        next_y = current_y + (dx / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
+
+        # Stop at the dry-bed cap or if a stage hit critical depth
+        if next_y <= 0.05 or stop1 or stop2 or stop3 or stop4:
+            break
+
+        current_x += dx
+        current_y = next_y
+
+        x_vals[k] = current_x
+        y_vals[k] = current_y
+        k += 1
+
+    return x_vals[:k], y_vals[:k]
+
+_rk4_core = njit(cache=True, fastmath=True)(_rk4_loop)
+
+_KERNEL_TEMPLATE = """
+def dydx(y):
+    if y <= 0.05: return 0.0, False
+    A = ({b!r} + {m!r} * y) * y
+    invA = 1.0 / A
+    P = {b!r} + 2 * y * {sqrt_1pm2!r}
+    R = A / P
+    T = {b!r} + 2 * {m!r} * y
+    Sf = {n2Q2!r} * invA * invA / (R * _cbrt(R))
+    Fr2 = {Q2_g!r} * T * invA * invA * invA
+    if abs(1 - Fr2) < 0.01: return 0.0, True
+    return ({S0!r} - Sf) / (1 - Fr2), False
+"""
+
+@lru_cache(maxsize=32)
+def make_dydx_kernel(ch):
+    """
+    Builds dy/dx for one channel with every parameter baked in as a
+    literal, so the compiler can fold the constants. Returns k(y), with
+    the same (dy/dx, stop) result as _get_dy_dx.
+    """
+    src = _KERNEL_TEMPLATE.format(
+        b=float(ch.b), m=float(ch.m), S0=float(ch.S0),
+        sqrt_1pm2=float(ch._sqrt_1pm2),
+        n2Q2=float(ch._n2Q2),
+        Q2_g=float(ch._Q2_g),
+    )
+    namespace = {"_cbrt": _cbrt}
+    exec(src, namespace)
+    return njit(fastmath=True)(namespace["dydx"])
+
+def solve_profile(ch, x_start, y_start, length, step_size, specialize=False):
+    """
+    Fixed-step RK4 profile, returned as (x, y) numpy arrays.
+
+    specialize=True only matters without numba: the pure-Python loop
+    then uses a slope function generated for this channel (see
+    make_dydx_kernel), roughly 20% faster. Under numba it is ignored;
+    compiling a kernel costs ~0.4 s per channel and gains nothing
+    measurable over the cached generic core.
+    """
     # Determine number of steps
     # We use abs() because step_size might be negative
     steps = int(length / abs(step_size))
     
     print(f"Starting Simulation: x={x_start}, y={y_start}, dx={step_size}")
     
-    for _ in range(steps):
-        # RK4 Constants
-        k1 = get_dy_dx(current_x, current_y, ch)
-        k2 = get_dy_dx(current_x + step_size/2, current_y + k1*step_size/2, ch)
-        k3 = get_dy_dx(current_x + step_size/2, current_y + k2*step_size/2, ch)
-        k4 = get_dy_dx(current_x + step_size, current_y + k3*step_size, ch)
-        
-        next_y = current_y + (step_size / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
+    if specialize and not HAVE_NUMBA:
+        x_vals, y_vals = _rk4_loop(make_dydx_kernel(ch), (),
+                                   float(x_start), float(y_start), float(step_size), steps)
+    else:
+        params = (float(ch._n2Q2), float(ch._Q2_g), float(ch.S0), float(ch.b), float(ch.m),
+                  float(ch._sqrt_1pm2))
+        x_vals, y_vals = _rk4_core(_get_dy_dx, params,
+                                   float(x_start), float(y_start), float(step_size), steps)
+
+    if len(x_vals) < steps + 1:
+        print(f"Simulation stopped early at x={x_vals[-1]:.2f} (Approached Critical Depth or Dry Bed)")
         
-        # Stop if depth becomes unrealistic or hits critical depth
-        if next_y <= 0 or abs(get_dy_dx(current_x, next_y, ch)) == 0:
-            print(f"Simulation stopped early at x={current_x:.2f} (Approached Critical Depth or Dry Bed)")
+    return x_vals, y_vals
+
+@njit(cache=True, fastmath=True)
+def _dp45_core(x0, y0, dx, L, rtol, atol, n2Q2, Q2_g, S0, b, m, sqrt_1pm2):
+    """
+    Adaptive Dormand-Prince RK45 loop with FSAL: six new slope evaluations
+    per step, 5th-order solution, 4th-order embedded error estimate.
+    Integrates |x - x0| up to L in the direction of dx. Returns
+    (x, y, stopped); stopped is True when the profile ended before L
+    (critical depth, dry bed or a vanishing step).
+    """
+    size = 256
+    x_vals = np.empty(size)
+    y_vals = np.empty(size)
+    x_vals[0] = x0
+    y_vals[0] = y0
+
+    direction = 1.0 if dx > 0 else -1.0
+    h = abs(dx)
+    current_x = x0
+    current_y = y0
+    k = 1
+
+    k1, stop = _get_dy_dx(current_y, n2Q2, Q2_g, S0, b, m, sqrt_1pm2)
+    if stop:
+        return x_vals[:1], y_vals[:1], True
+
+    # Distance is tracked separately from x, so that reaching L does not
+    # depend on rounding in x0 + sum(dx)
+    travelled = 0.0
+    reached = L <= 0.0
+    while not reached and h > 1e-8:
+        last = h >= L - travelled
+        if last:
+            h = L - travelled
+        dx = direction * h
+
+        k2, stop2 = _get_dy_dx(current_y + dx*(k1/5), n2Q2, Q2_g, S0, b, m, sqrt_1pm2)
+        k3, stop3 = _get_dy_dx(current_y + dx*(3*k1/40 + 9*k2/40), n2Q2, Q2_g, S0, b, m, sqrt_1pm2)
+        k4, stop4 = _get_dy_dx(current_y + dx*(44*k1/45 - 56*k2/15 + 32*k3/9), n2Q2, Q2_g, S0, b, m, sqrt_1pm2)
+        k5, stop5 = _get_dy_dx(current_y + dx*(19372*k1/6561 - 25360*k2/2187 + 64448*k3/6561
+                                               - 212*k4/729), n2Q2, Q2_g, S0, b, m, sqrt_1pm2)
+        k6, stop6 = _get_dy_dx(current_y + dx*(9017*k1/3168 - 355*k2/33 + 46732*k3/5247
+                                               + 49*k4/176 - 5103*k5/18656), n2Q2, Q2_g, S0, b, m, sqrt_1pm2)
+
+        # A stage reached critical depth, so its zero slope
+        # is not a sample of the profile: retry with a shorter step
+        if stop2 or stop3 or stop4 or stop5 or stop6:
+            h *= 0.5
+            continue
+
+        next_y = current_y + dx*(35*k1/384 + 500*k3/1113 + 125*k4/192
+                                 - 2187*k5/6784 + 11*k6/84)
+        k7, stop = _get_dy_dx(next_y, n2Q2, Q2_g, S0, b, m, sqrt_1pm2)
+
+        # y5 - y4
+        err = abs(dx*(71*k1/57600 - 71*k3/16695 + 71*k4/1920
+                      - 17253*k5/339200 + 22*k6/525 - k7/40))
+        tol = atol + rtol*abs(next_y)
+        ratio = err / tol
+
+        if ratio <= 1.0:
+            # Stop at the dry-bed cap or at critical depth
+            if next_y <= 0.05 or stop:
+                break
+
+            current_x += dx
+            current_y = next_y
+            travelled += h
+            reached = last
+            k1 = k7
+
+            if k == size:
+                size *= 2
+                x_grown = np.empty(size)
+                y_grown = np.empty(size)
+                x_grown[:k] = x_vals[:k]
+                y_grown[:k] = y_vals[:k]
+                x_vals = x_grown
+                y_vals = y_grown
+
+            x_vals[k] = current_x
+            y_vals[k] = current_y
+            k += 1
+
+        if ratio == 0.0:
+            h *= 5.0
+        else:
+            h *= min(5.0, max(0.2, 0.9 * ratio**-0.2))
+
+    return x_vals[:k], y_vals[:k], not reached
+
+def solve_profile_adaptive(ch, x_start, y_start, length, step_size=5.0, rtol=1e-5, atol=1e-7):
+    """
+    Same profile as solve_profile, but with an error-controlled step:
+    short steps near critical depth, long ones on the approach to yn.
+    The sign of step_size sets the direction; its magnitude is the
+    first trial step.
+    """
+    print(f"Starting Adaptive Simulation: x={x_start}, y={y_start}, dx0={step_size}")
+
+    x_vals, y_vals, stopped = _dp45_core(float(x_start), float(y_start), float(step_size), float(length),
+                                         rtol, atol, ch._n2Q2, ch._Q2_g, ch.S0, ch.b, ch.m, ch._sqrt_1pm2)
+
+    if stopped:
+        print(f"Simulation stopped early at x={x_vals[-1]:.2f} (Approached Critical Depth or Dry Bed)")
+
+    return x_vals, y_vals
+
+def solve_profile_ivp(ch, x_start, y_start, length, step_size=5.0, method="LSODA",
+                      rtol=1e-6, atol=1e-8, max_step=50.0):
+    """
+    Profile via scipy's solve_ivp, for long reaches where an implicit
+    (LSODA) or high-order (DOP853) integrator needs far fewer slope
+    evaluations than fixed-step RK4. The sign of step_size sets the
+    direction. Integration ends at the near-critical band or the
+    dry-bed cap through terminal events.
+    """
+    # Imported here: scipy.integrate adds ~0.2 s to module import
+    from scipy.integrate import solve_ivp
+
+    params = (ch._n2Q2, ch._Q2_g, ch.S0, ch.b, ch.m, ch._sqrt_1pm2)
+    Q2_g, b, m = ch._Q2_g, ch.b, ch.m
+
+    def rhs(x, y):
+        return [_get_dy_dx(y[0], *params)[0]]
+
+    def crit_event(x, y):
+        Fr2 = Q2_g * (b + 2 * m * y[0]) / ((b + m * y[0]) * y[0])**3
+        return (1 - Fr2)**2 - 0.01**2
+    crit_event.terminal = True
+
+    def dry_event(x, y):
+        return y[0] - 0.05
+    dry_event.terminal = True
+
+    x_end = x_start + math.copysign(length, step_size)
+    print(f"Starting {method} Simulation: x={x_start}, y={y_start}, x_end={x_end}")
+
+    # Events only fire on a sign change, so a start already inside the
+    # near-critical band or at the dry-bed cap must be caught here
+    # (rhs would return 0 and carry the depth flat across the reach).
+    if crit_event(x_start, [y_start]) <= 0 or dry_event(x_start, [y_start]) <= 0:
+        print(f"Simulation stopped early at x={x_start:.2f} (Approached Critical Depth or Dry Bed)")
+        return np.array([float(x_start)]), np.array([float(y_start)])
+
+    sol = solve_ivp(rhs, (x_start, x_end), [y_start], method=method, rtol=rtol, atol=atol,
+                    events=(crit_event, dry_event), max_step=max_step)
+
+    if sol.status == 1:
+        print(f"Simulation stopped early at x={sol.t[-1]:.2f} (Approached Critical Depth or Dry Bed)")
+
+    return sol.t, sol.y[0]
+
+def _batch_params(ch, y_starts):
+    """
+    Broadcasts y_starts against the channel fields (which may themselves
+    be arrays) and returns y0 plus the slope-kernel parameters, all as
+    1-D float arrays of the same length.
+    """
+    y0, Q, n, S0, b, m, g = [np.array(v, dtype=float) for v in
+                             np.broadcast_arrays(np.ravel(y_starts), ch.Q, ch.n, ch.S0, ch.b, ch.m, ch.g)]
+    return y0, (n * n * Q * Q, Q * Q / g, S0, b, m, np.sqrt(1 + m * m))
+
+def _dydx_vec(y, n2Q2, Q2_g, S0, b, m, sqrt_1pm2):
+    """
+    _get_dy_dx over an array of depths, returning (dy/dx, stop) arrays.
+    Branch-free: capped and near-critical entries get a zero slope
+    through np.where, and only the near-critical ones set stop.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = (b + m * y) * y
+        invA = 1.0 / A
+        P = b + 2 * y * sqrt_1pm2
+        R = A / P
+        T = b + 2 * m * y
+        Sf = n2Q2 * invA * invA / (R * np.cbrt(R))
+        Fr2 = Q2_g * T * invA * invA * invA
+        dydx = (S0 - Sf) / (1 - Fr2)
+    stop = np.abs(1 - Fr2) < 0.01
+    return np.where((y <= 0.05) | stop, 0.0, dydx), stop
+
+def _rk4_batch_numpy(y0, params, dx, N):
+    """
+    Vectorized RK4 over the batch, one array pass per step.
+    """
+    y = y0.copy()
+    y_vals = np.full((N + 1, y.size), np.nan)
+    y_vals[0] = y
+    alive = np.ones(y.size, dtype=bool)
+
+    for i in range(N):
+        k1, stop1 = _dydx_vec(y, *params)
+        k2, stop2 = _dydx_vec(y + k1*dx/2, *params)
+        k3, stop3 = _dydx_vec(y + k2*dx/2, *params)
+        k4, stop4 = _dydx_vec(y + k3*dx, *params)
+
+        next_y = y + (dx / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
+
+        # Same stopping rule as solve_profile, applied per profile
+        alive &= (next_y > 0.05) & ~(stop1 | stop2 | stop3 | stop4)
+        if not alive.any():
             break
 
-        current_x += step_size
-        current_y = next_y
-        
-        x_vals.append(current_x)
-        y_vals.append(current_y)
-        
+        y = np.where(alive, next_y, y)
+        y_vals[i + 1, alive] = y[alive]
+
+    return y_vals
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _rk4_batch(y0, n2Q2, Q2_g, S0, b, m, sqrt_1pm2, dx, N):
+    """
+    Compiled RK4 over the batch. Each step advances every live trajectory
+    in a prange loop; interleaving independent trajectories keeps the
+    CPU busy instead of waiting on one dependent chain of divisions.
+    """
+    M = y0.shape[0]
+    y_vals = np.full((N + 1, M), np.nan)
+    y_vals[0] = y0
+    y = y0.copy()
+    alive = np.ones(M, dtype=np.bool_)
+
+    for i in range(N):
+        for j in prange(M):
+            if alive[j]:
+                yj = y[j]
+                k1, stop1 = _get_dy_dx(yj, n2Q2[j], Q2_g[j], S0[j], b[j], m[j], sqrt_1pm2[j])
+                k2, stop2 = _get_dy_dx(yj + k1*dx/2, n2Q2[j], Q2_g[j], S0[j], b[j], m[j], sqrt_1pm2[j])
+                k3, stop3 = _get_dy_dx(yj + k2*dx/2, n2Q2[j], Q2_g[j], S0[j], b[j], m[j], sqrt_1pm2[j])
+                k4, stop4 = _get_dy_dx(yj + k3*dx, n2Q2[j], Q2_g[j], S0[j], b[j], m[j], sqrt_1pm2[j])
+
+                next_y = yj + (dx / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
+
+                if next_y <= 0.05 or stop1 or stop2 or stop3 or stop4:
+                    alive[j] = False
+                else:
+                    y[j] = next_y
+                    y_vals[i + 1, j] = next_y
+
+        if not alive.any():
+            break
+
+    return y_vals
+
+def solve_profile_batch(ch, x_start, y_starts, length, step_size):
+    """
+    RK4 for many profiles at once: one per entry of y_starts, with
+    channel fields optionally given as arrays and broadcast against it.
+    Returns x of shape (steps+1,) and y of shape (steps+1, M); profiles
+    that stop early are padded with NaN.
+    """
+    y0, params = _batch_params(ch, y_starts)
+    steps = int(length / abs(step_size))
+
+    # The compiled path has no per-step overhead and wins for small and
+    # medium batches. The numpy path pays ~70 us per step in ufunc calls
+    # but is SIMD-vectorized, so on one or two threads it only overtakes
+    # the compiled loop for large batches (about 1000 trajectories).
+    if HAVE_NUMBA and (y0.size < 1000 or get_num_threads() > 2):
+        y_vals = _rk4_batch(y0, *params, float(step_size), steps)
+    else:
+        y_vals = _rk4_batch_numpy(y0, params, float(step_size), steps)
+
+    x_vals = x_start + step_size * np.arange(steps + 1)
     return x_vals, y_vals
 
+@lru_cache(maxsize=8)
+def _jax_rk4_batch(N):
+    """
+    Builds the jitted, vmapped RK4 integrator for N steps. The JAX
+    version of _dydx_vec is fully branch-free so every trajectory runs
+    the same instructions on SIMD/SIMT hardware.
+    """
+    import jax
+    import jax.numpy as jnp
+    from jax import lax
+
+    def dydx(y, n2Q2, Q2_g, S0, b, m, sqrt_1pm2):
+        A = (b + m * y) * y
+        invA = 1.0 / A
+        P = b + 2 * y * sqrt_1pm2
+        R = A / P
+        T = b + 2 * m * y
+        Sf = n2Q2 * invA * invA / (R * jnp.cbrt(R))
+        Fr2 = Q2_g * T * invA * invA * invA
+        stop = (1 - Fr2) * (1 - Fr2) < 1e-4
+        return jnp.where((y <= 0.05) | stop, 0.0, (S0 - Sf) / (1 - Fr2)), stop
+
+    def profile(y0, dx, *params):
+        def rk4_step(carry, _):
+            y, alive = carry
+            k1, stop1 = dydx(y, *params)
+            k2, stop2 = dydx(y + k1*dx/2, *params)
+            k3, stop3 = dydx(y + k2*dx/2, *params)
+            k4, stop4 = dydx(y + k3*dx, *params)
+
+            next_y = y + (dx / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
+
+            alive = alive & (next_y > 0.05) & ~(stop1 | stop2 | stop3 | stop4)
+            y = jnp.where(alive, next_y, y)
+            return (y, alive), jnp.where(alive, y, jnp.nan)
+
+        _, ys = lax.scan(rk4_step, (y0, jnp.asarray(True)), None, length=N)
+        return jnp.concatenate([y0[None], ys])
+
+    return jax.jit(jax.vmap(profile, in_axes=(0, None, 0, 0, 0, 0, 0, 0)))
+
+def solve_profile_batch_jax(ch, x_start, y_starts, length, step_size):
+    """
+    solve_profile_batch on JAX (runs on a GPU when one is available).
+    Channel fields may also be arrays, e.g. Monte Carlo samples of n or
+    S0; they are broadcast against y_starts, one trajectory per entry.
+    Same output layout as solve_profile_batch. Requires jax with 64-bit
+    mode enabled by the caller at startup, e.g.
+    jax.config.update("jax_enable_x64", True) or JAX_ENABLE_X64=1.
+    """
+    import jax
+
+    # float32 is too coarse for the near-critical cutoff, and x64 is a
+    # process-wide setting that a library call should not flip.
+    if not jax.config.jax_enable_x64:
+        raise RuntimeError("solve_profile_batch_jax needs float64: enable jax_enable_x64 "
+                           "(JAX_ENABLE_X64=1) before using JAX")
+
+    y0, params = _batch_params(ch, y_starts)
+    steps = int(length / abs(step_size))
+
+    y_vals = _jax_rk4_batch(steps)(y0, float(step_size), *params)
+
+    x_vals = x_start + step_size * np.arange(steps + 1)
+    return x_vals, np.asarray(y_vals).T
+
 # ==========================================
 # 4. MAIN USER INTERFACE
 # ==========================================
@@ -189,14 +725,21 @@ def main():
         ch = Channel(Q, n, S0, b, m)
         
         # --- B. Calculate Reference Depths ---
-        yn = solve_normal_depth(ch)
-        yc = solve_critical_depth(ch)
+        yn, yn_ok = solve_normal_depth(ch)
+        yc, yc_ok = solve_critical_depth(ch)
+
+        if not yn_ok:
+            print("Warning: Normal depth did not converge.")
+        if not yc_ok:
+            print("Warning: Critical depth did not converge.")
         
         print(f"\n[ CALCULATED REFERENCE DEPTHS ]")
         print(f"Normal Depth (yn)   : {yn:.4f} m")
         print(f"Critical Depth (yc) : {yc:.4f} m")
         
-        if yn > yc:
+        if not (yn_ok and yc_ok):
+            print("Slope Type: UNKNOWN (reference depth not found)")
+        elif yn > yc:
             print("Slope Type: MILD (M-profile)")
         elif yn < yc:
             print("Slope Type: STEEP (S-profile)")
@@ -228,6 +771,10 @@ def main():
         x_plot, y_plot = solve_profile(ch, x_start, y_start, sim_length, dx)
         
         # --- F. Plotting ---
+        # Imported here so that using this file as a library does not pay
+        # for matplotlib's startup (font cache, backend probe).
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(10, 6))
         
         # 1. Plot Water Surface
@@ -251,7 +798,7 @@ def main():
         plt.axhline(0, color='k', linewidth=3, label='Channel Bottom')
 
         # Fill zones
-        plt.fill_between([min(x_plot), max(x_plot)], yn, yc, color='yellow', alpha=0.1, label='Transition Zone')
+        plt.fill_between([x_plot[0], x_plot[-1]], yn, yc, color='yellow', alpha=0.1, label='Transition Zone')
         
         plt.title(f"GVF Profile | Q={Q}, n={n}, S0={S0}")
         plt.xlabel("Distance along Channel (m)")